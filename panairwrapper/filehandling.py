@@ -17,10 +17,33 @@ http://www.pdas.com/panairrefs.html
 
 """
 from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
 import numpy as np
-from math import copysign
 from os.path import join
-import re
+try:
+    import pyevtk.hl as _evtk
+except ImportError:
+    try:
+        import evtk.hl as _evtk
+    except ImportError:
+        _evtk = None
+
+
+# fixed width (10 characters) field used throughout the Panair input file
+_FMT10 = '{:<10}'.format
+# each of these a value reaches costs one decimal of its fixed width field
+_DIGIT_THRESHOLDS = np.array([10., 100., 1000., 10000.])
+
+
+@lru_cache(maxsize=None)
+def _make_header(labels):
+    # header lines only depend on their labels, so build each one once
+    labels = list(labels)
+    if labels:
+        labels[0] = "="+labels[0]
+
+    return "".join(map(_FMT10, labels)) + "\n"
 
 
 class InputFile:
@@ -81,68 +104,56 @@ class InputFile:
         self._input_dict = OrderedDict()
 
     def write_inputfile(self, filename):
-        with open(filename, 'w') as f:
-            for name, text in self._input_dict.items():
-                f.write("$"+name+"\n")
-                f.write(text)
-            f.write("$end")
+        parts = []
+        for name, text in self._input_dict.items():
+            parts.append("$"+name+"\n")
+            parts.append(text)
+        parts.append("$end")
 
-    @staticmethod
-    def _format_opt(number):
-        fnumber = float(number)
-        return '{0:<10}'.format(fnumber)
+        with open(filename, 'w') as f:
+            f.write("".join(parts))
+
+    def _format_coords(self, coordinates):
+        # formats an (n, 3) array of coordinates, one string per point
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 3)
+        precision = self._fixed_width_precision(coordinates)
+
+        # all points go through a single printf-style call, one per line
+        uniform = np.unique(precision)
+        if uniform.size == 1:
+            fmt = ('%-10.'+str(uniform[0])+'f')*3+'\n'
+            args = coordinates.ravel().tolist()
+        else:
+            # '*' takes each value's precision from the argument before it
+            fmt = '%-10.*f%-10.*f%-10.*f\n'
+            args = [None]*(2*coordinates.size)
+            args[0::2] = precision.ravel().tolist()
+            args[1::2] = coordinates.ravel().tolist()
+
+        return ((fmt*len(coordinates)) % tuple(args)).splitlines()
 
     @staticmethod
-    def _format_str_opt(string):
-        return '{0:<10}'.format(string)
-
-    def _format_coord(self, coordinates):
-        precision = [6, 6, 6]
-        for i, c in enumerate(coordinates):
-            precision[i] = self._fixed_width_precision(c)
-
-        s = ('{0[0]:<10.'+str(precision[0])+'f}' +
-             '{0[1]:<10.'+str(precision[1])+'f}' +
-             '{0[2]:<10.'+str(precision[2])+'f}')
-
-        return s.format(coordinates)
+    def _pair_coords(coords):
+        # two points per line, an odd point out ends up on a line by itself
+        return ["".join(coords[k:k+2])+"\n" for k in range(0, len(coords), 2)]
 
     @staticmethod
-    def _fixed_width_precision(number):
-        precision = 8
-        if copysign(1, number) < 0:
-            precision -= 1
-        if abs(number) >= 10:
-            precision -= 1
-        if abs(number) >= 100:
-            precision -= 1
-        if abs(number) >= 1000:
-            precision -= 1
-        if abs(number) >= 10000:
-            precision -= 1
-        if abs(number) >= 100000:
+    def _fixed_width_precision(numbers):
+        # number of decimals that keeps each value 10 characters wide
+        magnitude = np.abs(numbers)
+        if (magnitude >= 100000).any():
             raise RuntimeError("formatting not implemented")
 
+        extra_digits = (magnitude[..., None] >= _DIGIT_THRESHOLDS).sum(axis=-1)
+        precision = 8 - np.signbit(numbers) - extra_digits
+
         return precision
 
     def _format_header(self, labels):
-        header = ""
-        for i, l in enumerate(labels):
-            if i == 0:
-                header += self._format_str_opt("="+l)
-            else:
-                header += self._format_str_opt(l)
-        header += "\n"
-
-        return header
+        return _make_header(tuple(labels))
 
     def _format_inputline(self, values):
-        inputs = ""
-        for v in values:
-            inputs += self._format_opt(v)
-        inputs += "\n"
-
-        return inputs
+        return "".join([_FMT10(float(v)) for v in values]) + "\n"
 
     def title(self, title, info):
         self._input_dict["TITLE"] = title+"\n"+info+"\n"
@@ -178,7 +189,7 @@ class InputFile:
         header2 = self._format_header(headers_2)
         input2 = self._format_inputline(alphas)
 
-        aoa_input = header1+input1+header2+input2
+        aoa_input = "".join([header1, input1, header2, input2])
 
         self._input_dict["ANGLES OF ATTACK"] = aoa_input
 
@@ -192,7 +203,7 @@ class InputFile:
         header2 = self._format_header(headers_2)
         input2 = self._format_inputline(betas)
 
-        beta_input = header1+input1+header2+input2
+        beta_input = "".join([header1, input1, header2, input2])
 
         self._input_dict["YAW ANGLE"] = beta_input
 
@@ -202,7 +213,7 @@ class InputFile:
         header2 = self._format_header(["sref", "bref", "cref", "dref"])
         input2 = self._format_inputline([sref, bref, cref, dref])
 
-        ref_input = header1+input1+header2+input2
+        ref_input = "".join([header1, input1, header2, input2])
 
         self._input_dict["REFERENCE DATA"] = ref_input
 
@@ -217,7 +228,7 @@ class InputFile:
         input2 = self._format_inputline([ipraic, nexdgn, ioutpr,
                                          ifmcpr, icostp])
 
-        printout = header1+input1+header2+input2
+        printout = "".join([header1, input1, header2, input2])
 
         self._input_dict["PRINTOUT CONTROL"] = printout
 
@@ -226,29 +237,23 @@ class InputFile:
         input1 = self._format_inputline([kn])
         header2 = self._format_header(["kt"])
         input2 = self._format_inputline([kt])
-        points_input = header1+input1+header2+input2
+        parts = [header1, input1, header2, input2]
         for i in range(int(kn)):
-            points_input += self._gen_network_inp(netnames[i], netpoints[i])
+            parts.append(self._gen_network_inp(netnames[i], netpoints[i]))
 
-        self._input_dict["POINTS kt="+str(kt)] = points_input
+        self._input_dict["POINTS kt="+str(kt)] = "".join(parts)
 
     def _gen_network_inp(self, netname, points):
         header = ("=nm       nn                                             " +
                   "    " + netname + "\n")
         nn, nm = points.shape[:2]
         values = self._format_inputline([nm, nn])
-        network_input = header+values
+        coords = self._format_coords(points)
+        parts = [header, values]
         for i in range(int(nn)):
-            for j in range(int(nm)):
-                network_input += self._format_coord(points[i, j])
-
-                if (j+1) % 2 is 0:
-                    network_input += "\n"
+            parts.extend(self._pair_coords(coords[i*nm:(i+1)*nm]))
 
-            if nm % 2 is not 0:
-                network_input += "\n"
-
-        return network_input
+        return "".join(parts)
 
     def trailingwakenetworks(self, kn, kt, matchw, netnames, inat,
                              insd, xwake, twake):
@@ -256,20 +261,20 @@ class InputFile:
         input1 = self._format_inputline([kn])
         header2 = self._format_header(["kt", "matchw"])
         input2 = self._format_inputline([kt, matchw])
-        wake_input = header1+input1+header2+input2
+        parts = [header1, input1, header2, input2]
         for i in range(int(kn)):
-            wake_input += self._gen_wake_inp(netnames[i], inat[i], insd[i],
-                                             xwake[i], twake[i])
+            parts.append(self._gen_wake_inp(netnames[i], inat[i], insd[i],
+                                            xwake[i], twake[i]))
 
-        self._input_dict["TRAILING matchw="+str(matchw)] = wake_input
+        self._input_dict["TRAILING matchw="+str(matchw)] = "".join(parts)
 
     def _gen_wake_inp(self, netname, inat, insd, xwake, twake):
         header = ("=inat     insd      xwake     twake                      " +
                   "    " + netname + "\n")
-        values = self._format_str_opt(inat) + self._format_opt(insd)
-        values += self._format_opt(xwake) + self._format_opt(twake)+"\n"
+        parts = [header, _FMT10(inat), _FMT10(float(insd)),
+                 _FMT10(float(xwake)), _FMT10(float(twake)), "\n"]
 
-        return header+values
+        return "".join(parts)
 
     def flowfieldproperties(self, nflowv, tpoff):
         header = self._format_header(["nflowv", "tpoff"])
@@ -282,15 +287,14 @@ class InputFile:
         input1 = self._format_inputline([isk1])
         header2 = self._format_header(["xof", "yof", "zof",
                                        "xof", "yof", "zof"])
-        offbody_input = header1+input1+header2
-        for i in range(int(isk1)):
-            offbody_input += self._format_coord(points[i])
-            if (i+1) % 2 is 0:
-                offbody_input += "\n"
-        if int(isk1) % 2 is not 0:
-            offbody_input += "\n"
+        points = np.asarray(points)
+        if len(points) < int(isk1):
+            raise RuntimeError("isk1 is larger than the number of points")
+        coords = self._format_coords(points[:int(isk1)])
+        parts = [header1, input1, header2]
+        parts.extend(self._pair_coords(coords))
 
-        self._input_dict["XYZ OF OFF-BODY POINTS"] = offbody_input
+        self._input_dict["XYZ OF OFF-BODY POINTS"] = "".join(parts)
 
 
 class OutputFiles:
@@ -306,24 +310,30 @@ class OutputFiles:
         # retrieves lines inside block
         begin_flag = "0*b*"+block_name
         end_flag = "0*e*"+block_name
+        lines = []
+        in_block = False
         with open(join(self._directory, "panair.out")) as f:
-            lines = f.readlines()
-            count = 0
-            while begin_flag not in lines[count]:
-                count += 1
-            front = count+1
-            while end_flag not in lines[count]:
-                count += 1
-            back = count
-
-            return lines[front:back]
+            for line in f:
+                if not in_block:
+                    in_block = begin_flag in line
+                elif end_flag in line:
+                    return lines
+                else:
+                    lines.append(line)
+
+        if not in_block:
+            raise RuntimeError("block "+block_name+" not found in panair.out")
+        raise RuntimeError("block "+block_name+" not terminated in panair.out")
 
     @staticmethod
     def _lines_to_numpy(data_lines):
         # converts lines that hold column data into numpy array
-        array = [[float(val) for val in line.split()] for line in data_lines]
+        if not data_lines:
+            return np.array([])
 
-        return np.array(array)
+        # loadtxt parses in C and raises ValueError on rows of different
+        # lengths or values that are not numbers
+        return np.loadtxt(data_lines, ndmin=2)
 
     def get_offbody_data(self):
         block_lines = self._get_block("off-body")
@@ -334,11 +344,12 @@ class OutputFiles:
         return data
 
     def get_forces_and_moments(self):
+        # the coefficients are on lines 18 and 19 of the file
         with open(join(self._directory, "ffmf")) as f:
-            lines = f.readlines()
+            line1, line2 = islice(f, 17, 19)
 
-        data1 = list(map(float, lines[17].split()))
-        data2 = list(map(float, lines[18].split()))
+        data1 = list(map(float, line1.split()))
+        data2 = list(map(float, line2.split()))
 
         ffmf = {'cl': data1[3],
                 'cdi': data1[4],
@@ -354,9 +365,11 @@ class OutputFiles:
         return ffmf
 
     def check_successful(self):
-        with open(join(self._directory, "panair.err")) as f:
-            lines = f.readlines()
-            words = lines[-1].split()
+        # only the last line is needed, so read just the end of the file
+        with open(join(self._directory, "panair.err"), 'rb') as f:
+            f.seek(0, 2)
+            f.seek(max(f.tell()-4096, 0))
+            words = f.read().splitlines()[-1].decode().split()
             if words[0] == "ABORT":
                 success = False
             else:
@@ -365,32 +378,60 @@ class OutputFiles:
         return success
 
     def parse_agps(self):
-        # parses data in agps file into list.
-        # List contains network #, column #, row #, x, y, z, Cp
-        # for each point.
+        # parses data in agps file into dicts keyed by network #.
+        # Each network is an array with column #, row #, x, y, z, Cp
+        # for each point, and its grid shape is (# of rows, # of columns).
         with open(join(self._directory, "agps")) as f:
-            lines = f.readlines()
+            lines = f.read().splitlines()
 
-        data = []
+        # group the data rows of each network column so they can be
+        # converted to floats in one call per column
         n = 0
         c = 0
+        rows = []
+        blocks = [(n, c, rows)]
         for line in lines[6:]:
-            network = []
-            if re.match('n[0-9]*', line) is not None:
+            c0 = line[:1]
+            if c0 == 'n':
                 network, column = line.split('c')
                 n = int(network[1:])
                 c = int(column)
-            elif re.match('\*eof', line) is not None:
+                rows = []
+                blocks.append((n, c, rows))
+            elif c0 == '*':
                 pass
-            elif re.match(' irow', line) is not None:
+            elif c0 == ' ' and line[1:5] == 'irow':
                 pass
             else:
-                row_data = line.split()
-                r = int(row_data[0])
-                xyzCp = list(map(float, row_data[1:]))
-                data.append([n, c, r]+xyzCp)
-
-        return data
+                rows.append(line)
+
+        parsed = []
+        counts = {}
+        shapes = {}
+        for n, c, rows in blocks:
+            if not rows:
+                continue
+            values = self._lines_to_numpy(rows)
+            parsed.append((n, c, values))
+            counts[n] = counts.get(n, 0) + values.shape[0]
+            # the grid is indexed by the irow values, not the block length
+            n_rows, n_columns = shapes.get(n, (0, 0))
+            shapes[n] = (max(n_rows, int(values[:, 0].max())),
+                         max(n_columns, c))
+
+        # fill one preallocated array per network
+        networks = {}
+        filled = {}
+        for n, c, values in parsed:
+            if n not in networks:
+                networks[n] = np.empty((counts[n], values.shape[1]+1))
+                filled[n] = 0
+            start = filled[n]
+            filled[n] += values.shape[0]
+            networks[n][start:filled[n], 0] = c
+            networks[n][start:filled[n], 1:] = values
+
+        return networks, shapes
 
 
     def generate_vtk(self, filename='panair', data=None) :
@@ -406,42 +447,43 @@ class OutputFiles:
         files instead as groups are intended to be the same geometry through 
         different timesteps.
         - 'data' is used if you want to send to use a different set of data than
-        the one from the agps. If left to None, the function will get data from the
-        agps.
+        the one from the agps. It is a list with network #, column #, row #, 
+        x, y, z, Cp for each point. If left to None, the function will get data
+        from the agps.
         
         OUTPUT :
         The function will produce one or several files, one for each network, 
         in the folder it's run from.
         '''
-        import evtk.hl
+        if _evtk is None:
+            raise ImportError("evtk is required to generate vtk files")
         if data is None:
-            data = self.parse_agps()
-        
-        networks = int(max(np.array(data)[:,0]))
-        all_points = []
-        for i in range(networks) :
-            all_points.append([])
-        for p in data :
-            all_points[int(p[0]-1)].append(p)
-
-        for n in range(networks) :
-            points_array = np.array(all_points[n])
-            n_columns = int(max(points_array[:,1]))
-            n_rows = int(max(points_array[:,2]))
-            
-            X = np.zeros((n_rows, n_columns, 1))
-            Y = np.zeros((n_rows, n_columns, 1))
-            Z = np.zeros((n_rows, n_columns, 1))
-            CP = np.zeros((n_rows, n_columns, 1))
-
-            for p in points_array :
-                X[int(p[2]-1),int(p[1]-1), 0] = p[3]
-                Y[int(p[2]-1),int(p[1]-1), 0] = p[4]
-                Z[int(p[2]-1),int(p[1]-1), 0] = p[5]
-                CP[int(p[2]-1),int(p[1]-1), 0] = p[6]
-
-            evtk.hl.gridToVTK(filename+'_network'+str(n+1), 
-                              X, Y, Z, pointData = {"CP" : CP})
+            networks, shapes = self.parse_agps()
+        else:
+            # sort the points by network and split them where it changes
+            points = np.array(data, dtype=float)
+            points = points[np.argsort(points[:,0], kind='stable')]
+            net_ids = points[:,0].astype(int)
+            split_points = np.nonzero(np.diff(net_ids))[0]+1
+            networks = {int(p[0,0]): p[:,1:]
+                        for p in np.split(points, split_points)}
+            shapes = {n: (int(p[:,1].max()), int(p[:,0].max()))
+                      for n, p in networks.items()}
+
+        for n, points_array in networks.items() :
+            n_rows, n_columns = shapes[n]
+
+            # x, y, z and Cp share one buffer with the component first, so
+            # each of them is a contiguous slab that pyevtk can write as is.
+            # Each point goes to its (row, column) slot.
+            grid = np.zeros((4, n_rows, n_columns, 1))
+            index = ((points_array[:,1]-1)*n_columns +
+                     points_array[:,0]-1).astype(int)
+            grid.reshape(4, -1)[:, index] = points_array[:,2:6].T
+
+            _evtk.gridToVTK(filename+'_network'+str(n), 
+                            grid[0], grid[1], grid[2],
+                            pointData = {"CP" : grid[3]})
         
         
 def generate_vtk_input(data, filename='panair') :
@@ -457,22 +499,16 @@ def generate_vtk_input(data, filename='panair') :
     The function will produce one or several files, one for each network, 
     in the folder it's run from.
     '''
-    import evtk.hl
+    if _evtk is None:
+        raise ImportError("evtk is required to generate vtk files")
     networks = len(data)
     for n in range(networks) :
-        points_array = np.array(data[n])
-        n_columns = int(points_array.shape[0])
-        n_rows = int(points_array.shape[1])
-        
-        X = np.zeros((n_rows, n_columns, 1))
-        Y = np.zeros((n_rows, n_columns, 1))
-        Z = np.zeros((n_rows, n_columns, 1))
-        
-        for i in range(n_columns) :
-            for j in range(n_rows) :
-                X[j, i, 0] = points_array[i, j, 0]
-                Y[j, i, 0] = points_array[i, j, 1]
-                Z[j, i, 0] = points_array[i, j, 2]
-                
-        evtk.hl.gridToVTK(filename+'_network'+str(n+1), X, Y, Z)
+        points_array = np.array(data[n], dtype=float)
+
+        # (columns, rows, xyz) -> (xyz, rows, columns, 1) in a single copy,
+        # so each coordinate is a contiguous slab that pyevtk accepts
+        grid = np.ascontiguousarray(points_array.transpose(2, 1, 0)[..., None])
+
+        _evtk.gridToVTK(filename+'_network'+str(n+1),
+                        grid[0], grid[1], grid[2])
 
@@ -308,15 +308,14 @@ class Results:
         return self._output_file.check_successful()
 
     def write_agps(self):
-        agps_data = self._output_file.parse_agps()
+        networks, _ = self._output_file.parse_agps()
 
         with open(os.path.join(self._directory, "agps.csv"), 'w') as f:
-            for row in agps_data:
-                for i, v in enumerate(row):
-                    f.write(str(v))
-                    if i < 6:
-                        f.write(',')
-                f.write('\n')
+            for n, points in networks.items():
+                for row in points.tolist():
+                    values = [n, int(row[0]), int(row[1])] + row[2:]
+                    f.write(','.join(map(str, values)))
+                    f.write('\n')
 
     def write_vtk(self):
         self._output_file.generate_vtk()
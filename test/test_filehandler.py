@@ -3,6 +3,8 @@
 
 import pytest
 import filecmp
+import os
+import shutil
 import numpy as np
 import panairwrapper.filehandling as fh
 
@@ -40,3 +42,211 @@ def test_inputfile():
     inputfile.write_inputfile(newfilename)
 
     assert filecmp.cmp(newfilename, reffilename)
+
+
+@pytest.fixture
+def agps_dir(tmp_path):
+    shutil.copy(os.path.join(TESTFILE_DIR, "agps"), str(tmp_path))
+
+    return tmp_path
+
+
+def test_parse_agps(agps_dir):
+    outputfiles = fh.OutputFiles(str(agps_dir))
+
+    networks, shapes = outputfiles.parse_agps()
+
+    assert list(networks) == [1, 2]
+    assert shapes == {1: (2, 3), 2: (3, 2)}
+    # column #, row #, x, y, z, Cp
+    assert networks[1].shape == (6, 6)
+    assert networks[2].shape == (6, 6)
+    assert np.allclose(networks[1][3], [2., 2., 2., 2., 1., 0.22])
+    assert np.allclose(networks[2][:, 1], [1., 2., 3., 1., 2., 3.])
+
+
+@pytest.fixture
+def vtk_grids(monkeypatch):
+    """Records the grids passed on to the real gridToVTK."""
+    grids = {}
+    gridToVTK = fh._evtk.gridToVTK
+
+    def record(path, x, y, z, **kwargs):
+        grids[os.path.basename(path)] = (x, y, z, kwargs["pointData"]["CP"])
+        return gridToVTK(path, x, y, z, **kwargs)
+
+    monkeypatch.setattr(fh._evtk, "gridToVTK", record)
+
+    return grids
+
+
+@pytest.mark.skipif(fh._evtk is None, reason="evtk is not installed")
+def test_generate_vtk(agps_dir, vtk_grids):
+    grids = vtk_grids
+    outputfiles = fh.OutputFiles(str(agps_dir))
+
+    outputfiles.generate_vtk(os.path.join(str(agps_dir), "panair"))
+
+    assert os.path.isfile(os.path.join(str(agps_dir), "panair_network1.vts"))
+    assert os.path.isfile(os.path.join(str(agps_dir), "panair_network2.vts"))
+    X, Y, Z, CP = grids["panair_network1"]
+    assert X.shape == (2, 3, 1)
+    # x follows the column and y the row in the test file
+    assert np.allclose(X[:, :, 0], [[1., 2., 3.], [1., 2., 3.]])
+    assert np.allclose(Y[:, :, 0], [[1., 1., 1.], [2., 2., 2.]])
+    assert np.allclose(Z, 1.)
+    assert np.allclose(CP[:, :, 0], [[0.11, 0.21, 0.31], [0.12, 0.22, 0.32]])
+    assert grids["panair_network2"][0].shape == (3, 2, 1)
+
+
+@pytest.mark.skipif(fh._evtk is None, reason="evtk is not installed")
+def test_generate_vtk_from_data(agps_dir, vtk_grids):
+    outputfiles = fh.OutputFiles(str(agps_dir))
+    networks, _ = outputfiles.parse_agps()
+    outputfiles.generate_vtk(os.path.join(str(agps_dir), "agps"))
+
+    # flat network #, column #, row #, x, y, z, Cp list in shuffled order
+    data = [[n]+p for n, points in networks.items() for p in points.tolist()]
+    data = [data[i] for i in np.random.RandomState(0).permutation(len(data))]
+    outputfiles.generate_vtk(os.path.join(str(agps_dir), "data"), data=data)
+
+    for n in (1, 2):
+        from_agps = vtk_grids["agps_network"+str(n)]
+        from_data = vtk_grids["data_network"+str(n)]
+        for a, b in zip(from_agps, from_data):
+            assert a.shape == b.shape
+            assert np.array_equal(a, b)
+
+
+def test_lines_to_numpy():
+    data = fh.OutputFiles._lines_to_numpy(["1 2 3\n", " 4.5E+00 -5 6\n"])
+
+    assert data.shape == (2, 3)
+    assert np.allclose(data, [[1., 2., 3.], [4.5, -5., 6.]])
+
+
+def test_lines_to_numpy_ragged():
+    # same total number of values as a rectangular 3 x 5 block
+    lines = ["1 2 3 4 5\n", "1 2 3 4 5 6\n", "1 2 3 4\n"]
+
+    with pytest.raises(ValueError):
+        fh.OutputFiles._lines_to_numpy(lines)
+
+
+def test_lines_to_numpy_unparseable():
+    # run-together Fortran fields
+    lines = ["1 0.1 0.2\n", "2 0.6-0.7 0.8\n"]
+
+    with pytest.raises(ValueError):
+        fh.OutputFiles._lines_to_numpy(lines)
+
+
+def test_inputfile_mixed_precision(tmp_path):
+    # mixed signs and magnitudes give each value its own precision
+    points = np.array([[[1.5, -2.25, 12.5],
+                        [-0.0, 123.456, -1234.5],
+                        [10000.0, -10.0, 0.0]],
+                       [[-1.5, 2.25, -12.5],
+                        [0.5, -123.456, 1234.5],
+                        [-10000.0, 10.0, -0.5]]])
+    inputfile = fh.InputFile()
+    inputfile.points(1, 1, ['wing'], [points])
+    inputfile.xyzcoordinatesofoffbodypoints(3, points[0])
+
+    filename = str(tmp_path / "mixed.INP")
+    inputfile.write_inputfile(filename)
+    with open(filename) as f:
+        lines = f.read().splitlines()
+
+    first_row = ["1.50000000-2.250000012.5000000-0.0000000123.456000-1234.5000",
+                 "10000.0000-10.0000000.00000000"]
+    second_row = ["-1.50000002.25000000-12.5000000.50000000-123.456001234.50000",
+                  "-10000.00010.0000000-0.5000000"]
+    # two points per line, the odd point of each network row on its own
+    assert lines[7:11] == first_row + second_row
+    assert lines[-3:-1] == first_row
+
+
+def test_inputfile_coordinate_too_large():
+    points = np.zeros((2, 2, 3))
+    points[1, 0, 2] = -100000.
+
+    inputfile = fh.InputFile()
+    with pytest.raises(RuntimeError):
+        inputfile.points(1, 1, ['wing'], [points])
+    with pytest.raises(RuntimeError):
+        inputfile.xyzcoordinatesofoffbodypoints(4, points.reshape(-1, 3))
+
+
+@pytest.mark.parametrize("n_lines", [3, 1000])
+@pytest.mark.parametrize("last_line, success", [
+    ("ABORT - singular matrix\n", False),
+    ("execution completed\n", True)])
+def test_check_successful(tmp_path, n_lines, last_line, success):
+    # 1000 lines puts the file well past the 4 KiB tail that is read
+    with open(str(tmp_path / "panair.err"), 'w') as f:
+        f.write("  ABORT in an earlier line\n"*n_lines)
+        f.write(last_line)
+
+    outputfiles = fh.OutputFiles(str(tmp_path))
+
+    assert outputfiles.check_successful() is success
+
+
+def test_get_forces_and_moments(tmp_path):
+    with open(str(tmp_path / "ffmf"), 'w') as f:
+        for i in range(17):
+            f.write(" header line "+str(i)+"\n")
+        f.write(" 1 2.0 3.0 0.25 0.01 -0.02 1.5 -2.5 3.5\n")
+        f.write(" 0.1 -0.2 0.3 12.0\n")
+        f.write(" 9 9 9 9 9 9 9 9 9\n")
+
+    outputfiles = fh.OutputFiles(str(tmp_path))
+    ffmf = outputfiles.get_forces_and_moments()
+
+    assert ffmf == {'cl': 0.25, 'cdi': 0.01, 'cy': -0.02,
+                    'fx': 1.5, 'fy': -2.5, 'fz': 3.5,
+                    'mx': 0.1, 'my': -0.2, 'mz': 0.3, 'area': 12.0}
+
+
+@pytest.fixture
+def panair_out_dir(tmp_path):
+    shutil.copy(os.path.join(TESTFILE_DIR, "panair.out"), str(tmp_path))
+
+    return tmp_path
+
+
+def test_get_offbody_data(panair_out_dir):
+    outputfiles = fh.OutputFiles(str(panair_out_dir))
+
+    data = outputfiles.get_offbody_data()
+
+    assert data.shape == (3, 5)
+    assert np.allclose(data[:, 0], [1., 2., 3.])
+    assert np.allclose(data[2], [3., 3., -1., 2., 0.1])
+
+
+def test_get_offbody_data_missing_block(panair_out_dir):
+    filename = str(panair_out_dir / "panair.out")
+    with open(filename) as f:
+        lines = [l for l in f if not l.startswith("0*b*")]
+    with open(filename, 'w') as f:
+        f.writelines(lines)
+
+    outputfiles = fh.OutputFiles(str(panair_out_dir))
+
+    with pytest.raises(RuntimeError, match="not found"):
+        outputfiles.get_offbody_data()
+
+
+def test_get_offbody_data_unterminated_block(panair_out_dir):
+    filename = str(panair_out_dir / "panair.out")
+    with open(filename) as f:
+        lines = [l for l in f if not l.startswith("0*e*")]
+    with open(filename, 'w') as f:
+        f.writelines(lines)
+
+    outputfiles = fh.OutputFiles(str(panair_out_dir))
+
+    with pytest.raises(RuntimeError, match="not terminated"):
+        outputfiles.get_offbody_data()
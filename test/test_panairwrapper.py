@@ -2,8 +2,10 @@
 import pytest
 import os
 import platform
+import shutil
 
 import panairwrapper
+from panairwrapper.panairwrapper import Results
 
 TESTFILE_DIR = os.path.join(os.path.dirname(__file__), 'testfiles')
 
@@ -33,3 +35,15 @@ def test_generate_dir(empty_case):
     assert os.path.isfile(os.path.join(TESTFILE_DIR, "panair_files", PANAIR_EXE))
 
 
+def test_write_agps(tmp_path):
+    shutil.copy(os.path.join(TESTFILE_DIR, "agps"), str(tmp_path))
+    results = Results(str(tmp_path))
+
+    results.write_agps()
+
+    with open(os.path.join(str(tmp_path), "agps.csv")) as f:
+        lines = f.read().splitlines()
+
+    assert len(lines) == 12
+    assert lines[0] == "1,1,1,1.0,1.0,1.0,0.11"
+    assert lines[-1] == "2,2,3,2.0,3.0,2.0,0.23"